@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import jsonify
+
+GRUPOS_PADRAO = {
+    'carrinho': {'limite': 8, 'fila': 100, 'espera_segundos': 2.0},
+    'livro': {'limite': 8, 'fila': 200, 'espera_segundos': 1.0}
+}
+
+
+class Sobrecarga(Exception):
+    def __init__(self, posicao, retry_after):
+        super().__init__('Servidor ocupado, tente novamente em instantes')
+        self.posicao = posicao
+        self.retry_after = retry_after
+
+
+class GrupoAdmissao:
+    # No máximo `limite` pedidos do grupo rodam ao mesmo tempo; os demais
+    # esperam numa fila FIFO de tamanho limitado, cada um por no máximo
+    # `espera_segundos`. Fila cheia ou espera vencida viram Sobrecarga.
+    def __init__(self, nome, limite, fila, espera_segundos):
+        self.nome = nome
+        self.limite = limite
+        self.tamanho_fila = fila
+        self.espera_segundos = espera_segundos
+        self._cond = threading.Condition()
+        self._fila = deque()
+        self.ativos = 0
+        self.admitidos = 0
+        self.enfileirados = 0
+        self.recusados_fila_cheia = 0
+        self.recusados_espera = 0
+        self.espera_maxima_ms = 0.0
+        # Média móvel do tempo de atendimento, para estimar o Retry-After
+        self.servico_medio = 0.05
+
+    def _retry_after(self, posicao):
+        return max(1, math.ceil(self.servico_medio * posicao / self.limite))
+
+    def entrar(self):
+        with self._cond:
+            if self.ativos < self.limite and not self._fila:
+                self.ativos += 1
+                self.admitidos += 1
+                return
+            if len(self._fila) >= self.tamanho_fila:
+                self.recusados_fila_cheia += 1
+                posicao = len(self._fila) + 1
+                raise Sobrecarga(posicao, self._retry_after(posicao))
+
+            vez = object()
+            self._fila.append(vez)
+            self.enfileirados += 1
+            inicio = time.monotonic()
+            prazo = inicio + self.espera_segundos
+            while self._fila[0] is not vez or self.ativos >= self.limite:
+                resta = prazo - time.monotonic()
+                if resta <= 0:
+                    posicao = self._fila.index(vez) + 1
+                    self._fila.remove(vez)
+                    self.recusados_espera += 1
+                    self._cond.notify_all()
+                    raise Sobrecarga(posicao, self._retry_after(posicao))
+                self._cond.wait(resta)
+
+            self._fila.popleft()
+            self.ativos += 1
+            self.admitidos += 1
+            self.espera_maxima_ms = max(self.espera_maxima_ms, (time.monotonic() - inicio) * 1000)
+            # O próximo da fila pode ter vaga também
+            self._cond.notify_all()
+
+    def sair(self, duracao):
+        with self._cond:
+            self.ativos -= 1
+            self.servico_medio = 0.9 * self.servico_medio + 0.1 * duracao
+            self._cond.notify_all()
+
+    def estatisticas(self):
+        with self._cond:
+            return {
+                'limite': self.limite,
+                'fila_maxima': self.tamanho_fila,
+                'espera_segundos': self.espera_segundos,
+                'ativos': self.ativos,
+                'na_fila': len(self._fila),
+                'admitidos': self.admitidos,
+                'enfileirados': self.enfileirados,
+                'recusados_fila_cheia': self.recusados_fila_cheia,
+                'recusados_espera': self.recusados_espera,
+                'espera_maxima_ms': self.espera_maxima_ms,
+                'servico_medio_ms': self.servico_medio * 1000
+            }
+
+
+class ControleAdmissao:
+    # Controle de admissão em processo para as rotas que mais disputam o pool
+    # do MySQL. Sob sobrecarga o excedente recebe 429 com Retry-After e a
+    # posição que tinha na fila, em vez de todo mundo esperar por uma conexão
+    # até estourar o tempo.
+    def __init__(self):
+        self.grupos = {}
+
+    def init_app(self, app):
+        configuracao = app.config.get('ADMISSAO_GRUPOS', GRUPOS_PADRAO)
+        self.grupos = {nome: GrupoAdmissao(nome, **opcoes) for nome, opcoes in configuracao.items()}
+
+    def limitar(self, nome):
+        def decorador(view):
+            @wraps(view)
+            def envolvida(*args, **kwargs):
+                grupo = self.grupos.get(nome)
+                if grupo is None:
+                    return view(*args, **kwargs)
+                try:
+                    grupo.entrar()
+                except Sobrecarga as e:
+                    resposta = jsonify({'erro': str(e), 'posicao_fila': e.posicao, 'retry_after': e.retry_after})
+                    resposta.status_code = 429
+                    resposta.headers['Retry-After'] = str(e.retry_after)
+                    return resposta
+                inicio = time.monotonic()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    grupo.sair(time.monotonic() - inicio)
+            return envolvida
+        return decorador
+
+    def estatisticas(self):
+        return {nome: grupo.estatisticas() for nome, grupo in self.grupos.items()}
+
+
+admissao = ControleAdmissao()
@@ -0,0 +1,96 @@
+import math
+import re
+import struct
+
+from flask import request
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import undefer, with_expression
+
+from models import db, Livro
+from paginacao import ParametroInvalido
+
+TAMANHO_MAXIMO_BUSCA = 100
+TAMANHO_MINIMO_PALAVRA = 2
+PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+ORDENACOES = {'id': None, 'preco': Livro.preco, 'nome': Livro.nome}
+VERDADEIROS = ('1', 'true', 'sim')
+
+
+def montar_termos(texto):
+    # Modo booleano com prefixo (+palavra*) para casar enquanto o usuário
+    # digita; operadores vindos da entrada são descartados.
+    palavras = PALAVRA.findall(texto[:TAMANHO_MAXIMO_BUSCA])
+    return ' '.join(f'+{p}*' for p in palavras if len(p) >= TAMANHO_MINIMO_PALAVRA)
+
+
+def relevancia(termos):
+    return match(Livro.nome, Livro.sinopse, against=termos).in_boolean_mode()
+
+
+def buscar_livros(query, texto):
+    # Devolve a consulta filtrada pelo índice FULLTEXT e a expressão de
+    # relevância usada para ordenar e paginar, ou None se não há termos.
+    termos = montar_termos(texto)
+    if not termos:
+        return None
+    expressao = relevancia(termos)
+    query = query.filter(expressao).options(with_expression(Livro.relevancia, expressao))
+    return query, expressao
+
+
+def valor_preco(valor):
+    # livros.preco é FLOAT (precisão simples) no MySQL, e ele compara a coluna
+    # alargada para double: 19.9 gravado vira 19.8999996..., diferente do 19.9
+    # vindo da URL ou do cursor. Arredondar o valor para float32 antes de
+    # comparar faz empates e limites exatos casarem. O SQLite guarda double.
+    if db.engine.dialect.name != 'mysql':
+        return valor
+    return struct.unpack('f', struct.pack('f', valor))[0]
+
+
+def ler_parametro(nome, conversor):
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return None
+    try:
+        valor = conversor(valor)
+    except (ValueError, OverflowError):
+        raise ParametroInvalido(f'Parâmetro {nome} inválido')
+    if isinstance(valor, float) and not math.isfinite(valor):
+        raise ParametroInvalido(f'Parâmetro {nome} inválido')
+    return valor
+
+
+def filtrar_livros(query):
+    # Filtros de faixa/igualdade do catálogo. Com os índices compostos
+    # (filtro_id, preco, id) e (preco, id) viram varreduras de faixa no índice.
+    filtro_id = ler_parametro('filtro_id', int)
+    min_preco = ler_parametro('min_preco', float)
+    max_preco = ler_parametro('max_preco', float)
+
+    if filtro_id is not None:
+        query = query.filter(Livro.filtro_id == filtro_id)
+    if min_preco is not None:
+        query = query.filter(Livro.preco >= valor_preco(min_preco))
+    if max_preco is not None:
+        query = query.filter(Livro.preco <= valor_preco(max_preco))
+    if request.args.get('em_estoque', '').lower() in VERDADEIROS:
+        query = query.filter(Livro.estoque_atual > 0)
+    return query
+
+
+def ordenar_livros(query):
+    # Devolve a consulta e os argumentos de ordenação para paginar(). A coluna
+    # de ordenação sempre é carregada, mesmo fora de ?fields=, porque o cursor
+    # da próxima página é montado a partir dela.
+    ordem = request.args.get('sort', 'id')
+    if ordem not in ORDENACOES:
+        raise ParametroInvalido(f"Parâmetro sort deve ser um de: {', '.join(ORDENACOES)}")
+    coluna = ORDENACOES[ordem]
+    if coluna is None:
+        return query, {}
+    ordenacao = {'ordem': ordem, 'coluna': coluna}
+    if coluna is Livro.preco:
+        ordenacao['valor_cursor'] = valor_preco
+    return query.options(undefer(coluna)), ordenacao
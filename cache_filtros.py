@@ -0,0 +1,114 @@
+import json
+import threading
+
+from sqlalchemy import case, func
+
+from models import db, Filtro, Livro
+
+
+class CacheFiltros:
+    # Cópia em memória da tabela filtro. Carregada na subida (ou no primeiro
+    # uso) e atualizada por escrita direta em criar_filtro, que é o único
+    # caminho que altera a tabela. Com vários processos, um filtro criado em
+    # outro processo não está aqui: obter() vai ao banco quando não acha o id.
+    #
+    # Também mantém, por filtro, quantos livros existem e quantos têm estoque.
+    # Os contadores saem de um único GROUP BY na carga e depois são ajustados
+    # pelas rotas que criam/apagam livros ou mexem no estoque.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_id = {}
+        self._ids_por_nome = {}
+        self._contagens = {}
+        self._corpos = {}
+        self.carregado = False
+
+    def carregar(self):
+        filtros = Filtro.query.order_by(Filtro.id).all()
+        linhas = db.session.query(
+            Livro.filtro_id,
+            func.count(Livro.id),
+            func.sum(case((Livro.estoque_atual > 0, 1), else_=0))
+        ).group_by(Livro.filtro_id).all()
+        with self._lock:
+            self._por_id = {f.id: f.nome for f in filtros}
+            self._ids_por_nome = {f.nome: f.id for f in filtros}
+            self._contagens = {f.id: [0, 0] for f in filtros}
+            for filtro_id, total, em_estoque in linhas:
+                self._contagens[filtro_id] = [total, int(em_estoque or 0)]
+            self._corpos = {}
+            self.carregado = True
+
+    def _garantir_carregado(self):
+        if not self.carregado:
+            self.carregar()
+
+    def adicionar(self, id, nome):
+        with self._lock:
+            self._por_id[id] = nome
+            self._ids_por_nome[nome] = id
+            self._contagens.setdefault(id, [0, 0])
+            self._corpos = {}
+
+    def contar_livro(self, filtro_id, estoque, delta):
+        # delta = +1 ao criar um livro, -1 ao apagar
+        with self._lock:
+            contagem = self._contagens.setdefault(filtro_id, [0, 0])
+            contagem[0] += delta
+            if estoque > 0:
+                contagem[1] += delta
+            self._corpos.pop(True, None)
+
+    def mudar_estoque(self, filtro_id, antes, depois):
+        if (antes > 0) == (depois > 0):
+            return
+        with self._lock:
+            contagem = self._contagens.setdefault(filtro_id, [0, 0])
+            contagem[1] += 1 if depois > 0 else -1
+            self._corpos.pop(True, None)
+
+    def _buscar_no_banco(self, id):
+        filtro = db.session.get(Filtro, id)
+        if filtro is None:
+            return None
+        total, em_estoque = db.session.query(
+            func.count(Livro.id),
+            func.sum(case((Livro.estoque_atual > 0, 1), else_=0))
+        ).filter(Livro.filtro_id == id).one()
+        with self._lock:
+            self._por_id[id] = filtro.nome
+            self._ids_por_nome[filtro.nome] = id
+            self._contagens[id] = [total, int(em_estoque or 0)]
+            self._corpos = {}
+        return filtro.nome
+
+    def obter(self, id):
+        self._garantir_carregado()
+        nome = self._por_id.get(id)
+        if nome is None:
+            # Falta é rara (id inválido ou filtro de outro processo): confere
+            # no banco e, se existir, passa a servir da memória
+            nome = self._buscar_no_banco(id)
+        return None if nome is None else {'id': id, 'nome': nome}
+
+    def existe_nome(self, nome):
+        self._garantir_carregado()
+        return nome in self._ids_por_nome
+
+    def json(self, com_contagem=False):
+        self._garantir_carregado()
+        with self._lock:
+            corpo = self._corpos.get(com_contagem)
+            if corpo is None:
+                lista = []
+                for id, nome in sorted(self._por_id.items()):
+                    item = {'id': id, 'nome': nome}
+                    if com_contagem:
+                        item['livros'], item['em_estoque'] = self._contagens.get(id, (0, 0))
+                    lista.append(item)
+                corpo = json.dumps(lista, separators=(',', ':')).encode('utf-8')
+                self._corpos[com_contagem] = corpo
+            return corpo
+
+
+cache_filtros = CacheFiltros()
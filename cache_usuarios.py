@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import defer
+
+from models import db, AcessadoresSite
+
+
+class CacheUsuarios:
+    # LRU com validade das projeções de AcessadoresSite usadas pelas rotas de
+    # perfil (completa e pública), para /usuarios/<id> e /usuarios/me não irem
+    # ao banco a cada chamada. Usuário inexistente também fica guardado (como
+    # None); cadastro e atualização invalidam o id na hora, e a validade
+    # cobre mudanças feitas por fora da aplicação.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        # Muda a cada invalidação; uma carga que começou antes dela não grava
+        self._geracao = 0
+        self.capacidade = 1000
+        self.ttl = 60
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.invalidacoes = 0
+
+    def init_app(self, app):
+        self.capacidade = app.config.get('USUARIOS_CACHE_ITENS', self.capacidade)
+        self.ttl = app.config.get('USUARIOS_CACHE_TTL_SEGUNDOS', self.ttl)
+
+    def _carregar(self, id):
+        usuario = db.session.query(AcessadoresSite).options(defer(AcessadoresSite.senha_hash)).filter(
+            AcessadoresSite.id == id
+        ).one_or_none()
+        if usuario is None:
+            return None
+        return {'completo': usuario.to_dict_completo(), 'publico': usuario.to_dict_publico()}
+
+    def obter(self, id):
+        # {'completo': {...}, 'publico': {...}} ou None se o usuário não existe
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(id)
+            if entrada is not None:
+                expira_em, projecoes = entrada
+                if expira_em > agora:
+                    self._entradas.move_to_end(id)
+                    self.acertos += 1
+                    return projecoes
+                del self._entradas[id]
+                self.expirados += 1
+            self.falhas += 1
+            geracao = self._geracao
+
+        projecoes = self._carregar(id)
+        with self._lock:
+            if geracao == self._geracao:
+                self._entradas[id] = (agora + self.ttl, projecoes)
+                while len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+        return projecoes
+
+    def invalidar(self, id):
+        with self._lock:
+            self._geracao += 1
+            if self._entradas.pop(id, None) is not None:
+                self.invalidacoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._entradas),
+                'capacidade': self.capacidade,
+                'ttl_segundos': self.ttl,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else None,
+                'expirados': self.expirados,
+                'invalidacoes': self.invalidacoes
+            }
+
+
+cache_usuarios = CacheUsuarios()
@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from flask import current_app
+
+from sqlalchemy import Numeric, case, cast, delete, func, tuple_, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from estoque_fatiado import livros_fatiados, mover_fatiado
+from models import db, Carrinho, Livro
+from paginacao import ParametroInvalido
+from serializadores import CAMPOS_LIVRO_CARRINHO, consultar_livros
+
+# Preço é FLOAT na tabela; arredondar cada um para centavos em DECIMAL antes
+# de somar deixa o total exato, sem erro acumulado de ponto flutuante.
+PRECO_DECIMAL = cast(Livro.preco, Numeric(12, 2))
+
+MAXIMO_ITENS_LOTE = 100
+RESERVA_TTL_MINUTOS = 30
+
+
+def agora_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def prazo_reserva():
+    minutos = current_app.config.get('RESERVA_TTL_MINUTOS', RESERVA_TTL_MINUTOS)
+    return agora_utc() + timedelta(minutes=minutos)
+
+
+class ErroCarrinho(Exception):
+    def __init__(self, mensagem, status=400, livros=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.livros = livros
+
+    def corpo(self):
+        corpo = {'erro': str(self)}
+        if self.livros:
+            corpo['livros'] = self.livros
+        return corpo
+
+
+def itens_do_carrinho(usuario_id):
+    # Um único SELECT: cada linha do carrinho já é um livro com sua
+    # quantidade, juntada com livros (e filtro, via joinedload).
+    return consultar_livros(
+        Carrinho.acessadores_site_id == usuario_id,
+        campos=CAMPOS_LIVRO_CARRINHO
+    ).join(
+        Carrinho, Carrinho.livro_id == Livro.id
+    ).add_columns(Carrinho.quantidade, Carrinho.reservado_ate).order_by(Livro.id).all()
+
+
+def total_do_carrinho(usuario_id):
+    total = db.session.query(func.sum(PRECO_DECIMAL * Carrinho.quantidade)).select_from(Carrinho).join(
+        Livro, Carrinho.livro_id == Livro.id
+    ).filter(Carrinho.acessadores_site_id == usuario_id).scalar()
+    return Decimal(total or 0).quantize(Decimal('0.01'))
+
+
+def ler_itens(dados, quantidade_obrigatoria=True):
+    # {'itens': [{'livro_id': 1, 'quantidade': 2}, ...]} -> {1: 2}. Linhas
+    # repetidas do mesmo livro são somadas; sem quantidade (quando permitido)
+    # o valor é None, que na remoção significa a linha inteira.
+    itens = (dados or {}).get('itens')
+    if not isinstance(itens, list) or not itens:
+        raise ParametroInvalido('Informe a lista de itens')
+    if len(itens) > MAXIMO_ITENS_LOTE:
+        raise ParametroInvalido(f'No máximo {MAXIMO_ITENS_LOTE} itens por lote')
+
+    quantidades = {}
+    for item in itens:
+        try:
+            livro_id = int(item['livro_id'])
+            quantidade = item.get('quantidade')
+            if quantidade is None and not quantidade_obrigatoria:
+                quantidades[livro_id] = None
+                continue
+            quantidade = int(quantidade)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ParametroInvalido('Item do lote inválido')
+        if quantidade <= 0:
+            raise ParametroInvalido('Quantidade deve ser maior que zero')
+        if quantidades.get(livro_id, 0) is not None:
+            quantidades[livro_id] = quantidades.get(livro_id, 0) + quantidade
+    return quantidades
+
+
+def mover_estoque(deltas):
+    # deltas = {livro_id: +n ou -n}. Um único UPDATE condicional: uma retirada
+    # só acontece se ainda houver estoque, sem ler o valor antes e sem segurar
+    # a trava da linha além do próprio comando. Devolve False se algum livro
+    # não existe ou ficaria negativo; quem chama desfaz a transação.
+    # Livros com estoque fatiado passam primeiro pelas fatias; só o que não
+    # couber nelas vai para a linha do livro.
+    restos = _mover_fatias(deltas, livros_fatiados.fatias())
+    if not restos or _mover_linhas(restos):
+        return True
+
+    # A linha recusou uma retirada. Se o livro foi fatiado por outro processo
+    # (o comando do CLI) depois da última leitura da dica, a linha está zerada
+    # e o estoque está nas fatias: confere e tenta de novo por elas.
+    novos = livros_fatiados.conferir([id for id, d in restos.items() if d < 0])
+    if not novos:
+        return False
+    restos = _mover_fatias(restos, novos)
+    return not restos or _mover_linhas(restos)
+
+
+def _mover_fatias(deltas, fatias):
+    # Devolve o que sobrou para a linha de cada livro
+    if not fatias or fatias.keys().isdisjoint(deltas):
+        return deltas
+    restos = {}
+    for id, delta in deltas.items():
+        resto = mover_fatiado(id, delta, fatias[id]) if id in fatias else delta
+        if resto:
+            restos[id] = resto
+    return restos
+
+
+def _mover_linhas(deltas):
+    if len(deltas) == 1 or all(d > 0 for d in deltas.values()):
+        return _atualizar_linhas(deltas)
+    # O UPDATE em lote aplica as linhas que passam na condição mesmo quando
+    # outra falha; o savepoint desfaz essas para a nova tentativa começar limpa
+    ponto = db.session.begin_nested()
+    if _atualizar_linhas(deltas):
+        ponto.commit()
+        return True
+    ponto.rollback()
+    return False
+
+
+def _atualizar_linhas(deltas):
+    if len(deltas) == 1:
+        (id, delta), = deltas.items()
+        comando = update(Livro).where(Livro.id == id).values(estoque=Livro.estoque + delta)
+        if delta < 0:
+            comando = comando.where(Livro.estoque >= -delta)
+    else:
+        variacao = case(deltas, value=Livro.id)
+        comando = update(Livro).where(Livro.id.in_(sorted(deltas))).values(estoque=Livro.estoque + variacao)
+        if any(d < 0 for d in deltas.values()):
+            comando = comando.where(Livro.estoque + variacao >= 0)
+    resultado = db.session.execute(comando, execution_options={'synchronize_session': False})
+    return resultado.rowcount == len(deltas)
+
+
+def mudancas_de_estoque(deltas):
+    # (filtro_id, antes, depois) de cada livro alterado, lido na própria
+    # transação depois do UPDATE, para os contadores por categoria
+    linhas = db.session.query(Livro.id, Livro.filtro_id, Livro.estoque_atual).filter(Livro.id.in_(deltas))
+    return [(filtro_id, estoque - deltas[id], estoque) for id, filtro_id, estoque in linhas]
+
+
+def _explicar_falha(quantidades):
+    existentes = dict(db.session.query(Livro.id, Livro.estoque_atual).filter(Livro.id.in_(quantidades)))
+    faltando = [id for id in quantidades if id not in existentes]
+    if faltando:
+        raise ErroCarrinho('Livro não encontrado', 404, faltando)
+    raise ErroCarrinho('Livro sem estoque', 400, [id for id, n in quantidades.items() if existentes[id] < n])
+
+
+def _upsert(linhas):
+    if db.engine.dialect.name == 'mysql':
+        comando = mysql.insert(Carrinho).values(linhas)
+        return comando.on_duplicate_key_update(
+            quantidade=Carrinho.quantidade + comando.inserted.quantidade,
+            reservado_ate=comando.inserted.reservado_ate
+        )
+    comando = sqlite.insert(Carrinho).values(linhas)
+    return comando.on_conflict_do_update(
+        index_elements=['acessadores_site_id', 'livro_id'],
+        set_={
+            'quantidade': Carrinho.quantidade + comando.excluded.quantidade,
+            'reservado_ate': comando.excluded.reservado_ate
+        }
+    )
+
+
+def adicionar_itens(usuario_id, quantidades):
+    # Retira o estoque e soma as quantidades no carrinho, tudo dentro da
+    # transação corrente (quem chama faz o commit). Devolve as mudanças de
+    # estoque como (filtro_id, antes, depois).
+    deltas = {id: -n for id, n in quantidades.items()}
+    if not mover_estoque(deltas):
+        _explicar_falha(quantidades)
+    prazo = prazo_reserva()
+    db.session.execute(_upsert([
+        {'acessadores_site_id': usuario_id, 'livro_id': id, 'quantidade': n, 'reservado_ate': prazo}
+        for id, n in quantidades.items()
+    ]))
+    return mudancas_de_estoque(deltas)
+
+
+def remover_itens(usuario_id, quantidades=None):
+    # quantidades=None esvazia o carrinho inteiro
+    consulta = db.session.query(Carrinho.id, Carrinho.livro_id, Carrinho.quantidade).filter(
+        Carrinho.acessadores_site_id == usuario_id
+    )
+    if quantidades is not None:
+        consulta = consulta.filter(Carrinho.livro_id.in_(quantidades))
+    linhas = consulta.all()
+    if quantidades is not None:
+        faltando = sorted(set(quantidades) - {livro_id for _, livro_id, _ in linhas})
+        if faltando:
+            raise ErroCarrinho('Livro não está no carrinho', 404, faltando)
+    if not linhas:
+        return []
+
+    inteiras, parciais, deltas = [], {}, {}
+    for id, livro_id, quantidade in linhas:
+        pedida = quantidades.get(livro_id) if quantidades else None
+        n = quantidade if pedida is None else min(pedida, quantidade)
+        deltas[livro_id] = n
+        if n == quantidade:
+            inteiras.append((id, quantidade))
+        else:
+            parciais[id] = n
+
+    # Estoque primeiro, na mesma ordem de travas da inclusão. As linhas do
+    # carrinho só mudam se continuam como foram lidas; se outro pedido do
+    # mesmo usuário mexeu nelas no meio, nada é aplicado.
+    mover_estoque(deltas)
+    alteradas = 0
+    if inteiras:
+        alteradas += db.session.execute(
+            delete(Carrinho).where(tuple_(Carrinho.id, Carrinho.quantidade).in_(inteiras)),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+    if parciais:
+        retirada = case(parciais, value=Carrinho.id)
+        alteradas += db.session.execute(
+            update(Carrinho).where(
+                Carrinho.id.in_(parciais), Carrinho.quantidade > retirada
+            ).values(quantidade=Carrinho.quantidade - retirada),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+    if alteradas != len(linhas):
+        raise ErroCarrinho('O carrinho mudou durante a operação, tente novamente', 409)
+    return mudancas_de_estoque(deltas)
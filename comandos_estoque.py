@@ -0,0 +1,115 @@
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, update
+
+from carrinho import mover_estoque
+from estoque_fatiado import FATIAS_PADRAO, fatiar, juntar, livros_fatiados
+from models import db, AcessadoresSite, EstoqueSlot, Filtro, Livro
+
+# flask --app app estoque fatiar 42 --fatias 16
+# flask --app app estoque juntar 42
+# flask --app app estoque bench --threads 32 --retiradas 5000
+comandos_estoque = AppGroup('estoque', help='Estoque fatiado para livros muito disputados.')
+
+
+@comandos_estoque.command('fatiar')
+@click.argument('livro_id', type=int)
+@click.option('--fatias', default=FATIAS_PADRAO, show_default=True)
+def comando_fatiar(livro_id, fatias):
+    try:
+        fatiar(livro_id, fatias)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Livro {livro_id}: estoque dividido em {fatias} fatias')
+
+
+@comandos_estoque.command('juntar')
+@click.argument('livro_id', type=int)
+def comando_juntar(livro_id):
+    try:
+        juntar(livro_id)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Livro {livro_id}: estoque de volta em uma linha')
+
+
+@comandos_estoque.command('listar')
+def comando_listar():
+    for id, nome, fatias, estoque in db.session.query(
+        Livro.id, Livro.nome, Livro.estoque_fatias, Livro.estoque_atual
+    ).filter(Livro.estoque_fatias > 0).order_by(Livro.id):
+        click.echo(f'{id}\t{fatias} fatias\testoque {estoque}\t{nome}')
+
+
+def _medir(app, livro_id, threads, retiradas):
+    # Cada thread retira 1 unidade por transação (como um POST /carrinho),
+    # até o total de retiradas; devolve retiradas por segundo e falhas
+    restantes = [retiradas]
+    falhas = [0]
+    lock = threading.Lock()
+
+    def trabalhar():
+        with app.app_context():
+            while True:
+                with lock:
+                    if not restantes[0]:
+                        return
+                    restantes[0] -= 1
+                if mover_estoque({livro_id: -1}):
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+                    with lock:
+                        falhas[0] += 1
+
+    trabalhadores = [threading.Thread(target=trabalhar) for _ in range(threads)]
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    return retiradas / (time.perf_counter() - inicio), falhas[0]
+
+
+@comandos_estoque.command('bench')
+@click.option('--threads', default=16, show_default=True)
+@click.option('--retiradas', default=2000, show_default=True)
+@click.option('--fatias', default=FATIAS_PADRAO, show_default=True)
+def comando_bench(threads, retiradas, fatias):
+    # Mede a vazão de retiradas concorrentes de um mesmo livro com o contador
+    # numa linha só e com o estoque fatiado. Usa um livro temporário, apagado
+    # no fim; o número só faz sentido no banco de verdade (MySQL/InnoDB).
+    app = current_app._get_current_object()
+    usuario = AcessadoresSite.query.first()
+    filtro = Filtro.query.first()
+    if usuario is None or filtro is None:
+        raise click.ClickException('É preciso ao menos um usuário e um filtro cadastrados')
+
+    livro = Livro(
+        nome='bench estoque fatiado', preco=0, estoque=retiradas, sinopse='',
+        filtro_id=filtro.id, acessadores_site_id=usuario.id
+    )
+    db.session.add(livro)
+    db.session.commit()
+    livro_id = livro.id
+    try:
+        linha, falhas_linha = _medir(app, livro_id, threads, retiradas)
+        db.session.execute(update(Livro).where(Livro.id == livro_id).values(estoque=retiradas))
+        db.session.commit()
+        fatiar(livro_id, fatias)
+        fatiado, falhas_fatiado = _medir(app, livro_id, threads, retiradas)
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(EstoqueSlot).where(EstoqueSlot.livro_id == livro_id))
+        db.session.execute(delete(Livro).where(Livro.id == livro_id))
+        db.session.commit()
+        livros_fatiados.recarregar()
+
+    click.echo(f'{threads} threads, {retiradas} retiradas de 1 unidade')
+    click.echo(f"{'linha única':<12}{linha:10.1f} retiradas/s  ({falhas_linha} falhas)")
+    click.echo(f"{f'{fatias} fatias':<12}{fatiado:10.1f} retiradas/s  ({falhas_fatiado} falhas)")
+    click.echo(f'ganho: {fatiado / linha:.2f}x')
@@ -0,0 +1,72 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+CODIFICACOES = ('gzip', 'deflate')
+
+
+def comprimir(corpo, codificacao, nivel):
+    if codificacao == 'gzip':
+        return gzip.compress(corpo, compresslevel=nivel)
+    return zlib.compress(corpo, nivel)
+
+
+class Compressao:
+    # Negocia gzip/deflate em todas as respostas JSON acima de um tamanho
+    # mínimo. Respostas com ETag (catálogo, filtros) têm o mesmo corpo enquanto
+    # a URL e o ETag não mudam, então a versão comprimida fica num cache LRU limitado
+    # e é reaproveitada em vez de comprimir de novo a cada pedido.
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.minimo = app.config.get('COMPRESSAO_MINIMO_BYTES', 500)
+        self.nivel = app.config.get('COMPRESSAO_NIVEL', 6)
+        self.capacidade = app.config.get('COMPRESSAO_CACHE_ITENS', 128)
+        app.after_request(self._apos_pedido)
+
+    def _apos_pedido(self, resposta):
+        if (resposta.status_code != 200 or resposta.direct_passthrough or resposta.is_streamed
+                or resposta.content_encoding or resposta.mimetype != 'application/json'):
+            return resposta
+
+        resposta.vary.add('Accept-Encoding')
+        codificacao = request.accept_encodings.best_match(CODIFICACOES)
+        if codificacao is None:
+            return resposta
+        corpo = resposta.get_data()
+        if len(corpo) < self.minimo:
+            return resposta
+
+        etag, fraco = resposta.get_etag()
+        if etag and not fraco:
+            comprimido = self._do_cache((request.full_path, etag, codificacao), codificacao, corpo)
+            resposta.set_etag(f'{etag}-{codificacao}')
+        else:
+            comprimido = comprimir(corpo, codificacao, self.nivel)
+
+        resposta.set_data(comprimido)
+        resposta.content_encoding = codificacao
+        return resposta
+
+    def _do_cache(self, chave, codificacao, corpo):
+        # A chave inclui a URL: o ETag sozinho não prova que duas URLs têm o
+        # mesmo corpo
+        with self._lock:
+            comprimido = self._cache.get(chave)
+            if comprimido is not None:
+                self._cache.move_to_end(chave)
+                return comprimido
+
+        comprimido = comprimir(corpo, codificacao, self.nivel)
+        with self._lock:
+            self._cache[chave] = comprimido
+            while len(self._cache) > self.capacidade:
+                self._cache.popitem(last=False)
+        return comprimido
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+from sqlalchemy import update
+
+from models import db, EstoqueSlot, Livro
+
+FATIAS_PADRAO = 8
+
+
+class LivrosFatiados:
+    # Quais livros estão com o estoque fatiado e em quantas fatias. É só uma
+    # dica relida a cada poucos segundos, para não pagar uma leitura a mais
+    # em toda retirada. Desatualizada, ela manda o movimento para a linha do
+    # livro: entradas continuam somando no estoque visível
+    # (Livro.estoque_atual), mas uma retirada de um livro recém-fatiado
+    # (linha zerada) falha; por isso mover_estoque confere a dica com
+    # conferir() antes de recusar e tenta de novo pelas fatias.
+    def __init__(self, validade=5.0):
+        self._lock = threading.Lock()
+        self._fatias = {}
+        self._lido_em = None
+        self.validade = validade
+
+    def fatias(self):
+        if self._lido_em is None or time.monotonic() - self._lido_em > self.validade:
+            self.recarregar()
+        return self._fatias
+
+    def conferir(self, ids):
+        # Lê direto da linha (leitura com trava, que vê o último commit mesmo
+        # numa transação já aberta) quais desses livros estão fatiados e
+        # devolve os que a dica ainda não conhecia, já com a dica relida
+        atuais = dict(db.session.query(Livro.id, Livro.estoque_fatias).filter(
+            Livro.id.in_(ids), Livro.estoque_fatias > 0
+        ).with_for_update(read=True))
+        novos = {id: n for id, n in atuais.items() if self._fatias.get(id) != n}
+        if novos:
+            self.recarregar()
+        return novos
+
+    def recarregar(self):
+        linhas = db.session.query(Livro.id, Livro.estoque_fatias).filter(Livro.estoque_fatias > 0).all()
+        with self._lock:
+            self._fatias = dict(linhas)
+            self._lido_em = time.monotonic()
+
+
+livros_fatiados = LivrosFatiados()
+
+
+def _mudar_slot(livro_id, slot, delta):
+    comando = update(EstoqueSlot).where(
+        EstoqueSlot.livro_id == livro_id, EstoqueSlot.slot == slot
+    ).values(quantidade=EstoqueSlot.quantidade + delta)
+    if delta < 0:
+        comando = comando.where(EstoqueSlot.quantidade >= -delta)
+    return db.session.execute(comando, execution_options={'synchronize_session': False}).rowcount == 1
+
+
+def mover_fatiado(livro_id, delta, fatias):
+    # Aplica o delta nas fatias do livro e devolve a parte que sobrou para a
+    # linha de livros (0 quando tudo coube nas fatias). Cada UPDATE trava só
+    # uma fatia, então pedidos concorrentes do mesmo livro raramente esperam
+    # um pelo outro.
+    if delta > 0:
+        return 0 if _mudar_slot(livro_id, random.randrange(fatias), delta) else delta
+
+    falta = -delta
+    if _mudar_slot(livro_id, random.randrange(fatias), -falta):
+        return 0
+
+    # A fatia sorteada não tinha o bastante: lê os saldos (sem travar) e tira
+    # das que têm estoque, em ordem aleatória, até completar
+    saldos = db.session.query(EstoqueSlot.slot, EstoqueSlot.quantidade).filter(
+        EstoqueSlot.livro_id == livro_id, EstoqueSlot.quantidade > 0
+    ).all()
+    random.shuffle(saldos)
+    for slot, quantidade in saldos:
+        parte = min(quantidade, falta)
+        if _mudar_slot(livro_id, slot, -parte):
+            falta -= parte
+            if not falta:
+                return 0
+    return -falta
+
+
+def fatiar(livro_id, fatias=FATIAS_PADRAO):
+    # Passa o estoque da linha do livro para `fatias` linhas de estoque_slots,
+    # dividido por igual. A trava na linha do livro segura as retiradas pelo
+    # caminho normal enquanto a divisão acontece.
+    if fatias < 2:
+        raise ValueError('Use ao menos 2 fatias')
+    livro = db.session.query(Livro).filter(Livro.id == livro_id).with_for_update().one_or_none()
+    if livro is None:
+        raise ValueError('Livro não encontrado')
+    if livro.estoque_fatias:
+        raise ValueError('Livro já está com estoque fatiado')
+
+    base, sobra = divmod(livro.estoque, fatias)
+    db.session.add_all([
+        EstoqueSlot(livro_id=livro_id, slot=i, quantidade=base + (1 if i < sobra else 0))
+        for i in range(fatias)
+    ])
+    livro.estoque = 0
+    livro.estoque_fatias = fatias
+    db.session.commit()
+    livros_fatiados.recarregar()
+
+
+def juntar(livro_id):
+    # Caminho inverso: soma as fatias de volta na linha do livro e apaga-as
+    livro = db.session.query(Livro).filter(Livro.id == livro_id).with_for_update().one_or_none()
+    if livro is None:
+        raise ValueError('Livro não encontrado')
+    if not livro.estoque_fatias:
+        raise ValueError('Livro não está com estoque fatiado')
+
+    slots = EstoqueSlot.query.filter_by(livro_id=livro_id).with_for_update().all()
+    livro.estoque += sum(s.quantidade for s in slots)
+    livro.estoque_fatias = 0
+    for s in slots:
+        db.session.delete(s)
+    db.session.commit()
+    livros_fatiados.recarregar()
@@ -0,0 +1,10 @@
+// Token assinado devolvido pelo /login; vai no header Authorization de toda
+// rota que precisa do usuário logado
+export function salvarToken(token) {
+  localStorage.setItem('token', token);
+}
+
+export function cabecalhoAuth() {
+  const token = localStorage.getItem('token');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { cabecalhoAuth } from '../auth';
 import '../App.css';
 
 export default function AdicionarLivro() {
@@ -85,7 +86,7 @@ export default function AdicionarLivro() {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Id': String(usuario.id), // <-- Enviando o id do usuário no header
+        ...cabecalhoAuth()
       },
       body: JSON.stringify({
         nome: nome.trim(),
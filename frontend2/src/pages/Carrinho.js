@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { cabecalhoAuth } from '../auth';
 
 export default function Carrinho() {
   const [livros, setLivros] = useState([]);
@@ -7,16 +8,9 @@ export default function Carrinho() {
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    const usuario = JSON.parse(localStorage.getItem('usuario'));
-    if (!usuario) {
-      alert('Você precisa estar logado para ver o carrinho.');
-      navigate('/login');
-      return;
-    }
-
-    fetch('http://localhost:5000/carrinho', {
-      headers: { 'X-User-Id': usuario.id }
+  function carregarCarrinho(usuario) {
+    return fetch('http://localhost:5000/carrinho', {
+      headers: cabecalhoAuth()
     })
       .then(res => {
         if (!res.ok) throw new Error('Erro ao buscar carrinho');
@@ -32,6 +26,18 @@ export default function Carrinho() {
         alert('Erro ao carregar carrinho');
         setLoading(false);
       });
+  }
+
+  useEffect(() => {
+    const usuario = JSON.parse(localStorage.getItem('usuario'));
+    if (!usuario) {
+      alert('Você precisa estar logado para ver o carrinho.');
+      navigate('/login');
+      return;
+    }
+
+    carregarCarrinho(usuario);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [navigate]);
 
   function removerDoCarrinho(e, livroId) {
@@ -46,19 +52,13 @@ export default function Carrinho() {
 
     fetch(`http://localhost:5000/carrinho/${livroId}`, {
       method: 'DELETE',
-      headers: { 'X-User-Id': usuario.id }
+      headers: cabecalhoAuth()
     })
       .then(res => res.json())
       .then(data => {
         alert(data.mensagem || data.erro);
-        if (data.mensagem) {
-          const novaLista = livros.filter(p => p.id !== livroId);
-          setLivros(novaLista);
-
-          // Garantir que preco é número para soma correta
-          const novoTotal = novaLista.reduce((total, p) => total + Number(p.preco), 0);
-          setValorTotal(novoTotal.toFixed(2));
-        }
+        // O backend devolve as quantidades agrupadas e o total exato
+        if (data.mensagem) carregarCarrinho(usuario);
       })
       .catch(() => alert('Erro ao remover do carrinho'));
   }
@@ -167,6 +167,11 @@ export default function Carrinho() {
             >
               Preço: R$ {livro.preco.toFixed(2)}
             </p>
+            {livro.quantidade > 1 && (
+              <p style={{ color: '#7f8c8d', marginBottom: 10 }}>
+                Quantidade: {livro.quantidade}
+              </p>
+            )}
 
             <button
               className="botao-carrinho remover"
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
+import { cabecalhoAuth } from '../auth';
 
 export default function Livro() {
   const { id } = useParams();
@@ -38,7 +39,7 @@ export default function Livro() {
 
     fetch('http://localhost:5000/carrinho', {
       headers: {
-        'X-User-Id': usuarioLogado.id
+        ...cabecalhoAuth()
       }
     })
       .then(res => res.json())
@@ -58,7 +59,7 @@ export default function Livro() {
     fetch(`http://localhost:5000/livros/${livro.id}`, {
       method: 'DELETE',
       headers: {
-        'X-User-Id': usuarioLogado.id
+        ...cabecalhoAuth()
       }
     })
       .then(res => res.json())
@@ -159,7 +160,7 @@ export default function Livro() {
               method: 'POST',
               headers: {
                 'Content-Type': 'application/json',
-                'X-User-Id': usuarioLogado.id
+                ...cabecalhoAuth()
               },
               body: JSON.stringify({ livro_id: livro.id })
             })
@@ -182,7 +183,7 @@ export default function Livro() {
             fetch(`http://localhost:5000/carrinho/${livro.id}`, {
               method: 'DELETE',
               headers: {
-                'X-User-Id': usuarioLogado.id
+                ...cabecalhoAuth()
               }
             })
               .then(res => res.json())
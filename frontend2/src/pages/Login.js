@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
+import { salvarToken } from '../auth';
 import '../App.css';
 
 export default function Login() {
@@ -23,6 +24,7 @@ export default function Login() {
       .then(data => {
         if (data.usuario) {
           localStorage.setItem('usuario', JSON.stringify(data.usuario));
+          salvarToken(data.token);
           navigate('/paginaInicial');
         } else {
           setMensagem(data.erro || 'Erro desconhecido');
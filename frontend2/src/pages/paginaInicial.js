@@ -1,18 +1,27 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { cabecalhoAuth } from '../auth';
 import '../App.css';
 
+const TAMANHO_PAGINA = 24;
+const ATRASO_BUSCA_MS = 300;
+const CAMPOS_CARD = 'id,nome,preco,imagem_url';
+
 export default function PaginaInicial() {
   const [produtosFiltrados, setProdutosFiltrados] = useState([]);
   const [filtro, setFiltro] = useState('');
   const [filtros, setFiltros] = useState([]);
   const [filtroSelecionado, setFiltroSelecionado] = useState('');
+  const [ordenacao, setOrdenacao] = useState('');
+  const [precoMaximo, setPrecoMaximo] = useState('');
+  const [somenteEmEstoque, setSomenteEmEstoque] = useState(false);
   const [loading, setLoading] = useState(false);
   const [erro, setErro] = useState(null);
+  const [proximoCursor, setProximoCursor] = useState(null);
   const navigate = useNavigate();
 
   useEffect(() => {
-    fetch('http://localhost:5000/filtros')
+    fetch('http://localhost:5000/filtros?com_contagem=1')
       .then(res => res.json())
       .then(data => setFiltros(data))
       .catch(err => {
@@ -21,38 +30,41 @@ export default function PaginaInicial() {
       });
   }, []);
 
-  useEffect(() => {
-    async function buscarProdutos() {
-      setLoading(true);
-      setErro(null);
-      try {
-        let url = 'http://localhost:5000/livros';
-
-        if (filtroSelecionado) {
-          url = `http://localhost:5000/livros/filtro/${filtroSelecionado}`;
-        }
-
-        const res = await fetch(url);
-        if (!res.ok) throw new Error(`Erro ao buscar livros: ${res.statusText}`);
-        let data = await res.json();
-
-        if (filtro.trim()) {
-          const termo = filtro.trim().toLowerCase();
-          data = data.filter(l => l.nome.toLowerCase().includes(termo));
-        }
-
-        setProdutosFiltrados(data);
-      } catch (err) {
-        console.error(err);
-        setErro('Não foi possível carregar os livros.');
-        setProdutosFiltrados([]);
-      } finally {
-        setLoading(false);
-      }
+  async function buscarProdutos(cursor = null) {
+    setLoading(true);
+    setErro(null);
+    try {
+      const params = new URLSearchParams({ limit: TAMANHO_PAGINA, fields: CAMPOS_CARD });
+      if (filtro.trim()) params.set('q', filtro.trim());
+      if (filtroSelecionado) params.set('filtro_id', filtroSelecionado);
+      if (ordenacao) params.set('sort', ordenacao);
+      if (precoMaximo) params.set('max_preco', precoMaximo);
+      if (somenteEmEstoque) params.set('em_estoque', '1');
+      if (cursor) params.set('cursor', cursor);
+
+      const res = await fetch(`http://localhost:5000/livros?${params}`);
+      if (!res.ok) throw new Error(`Erro ao buscar livros: ${res.statusText}`);
+      const data = await res.json();
+      const livros = data.livros;
+
+      setProdutosFiltrados(anteriores => (cursor ? [...anteriores, ...livros] : livros));
+      setProximoCursor(data.next_cursor);
+    } catch (err) {
+      console.error(err);
+      setErro('Não foi possível carregar os livros.');
+      if (!cursor) setProdutosFiltrados([]);
+      setProximoCursor(null);
+    } finally {
+      setLoading(false);
     }
+  }
 
-    buscarProdutos();
-  }, [filtro, filtroSelecionado]);
+  useEffect(() => {
+    // Espera o usuário parar de digitar antes de consultar o servidor
+    const espera = setTimeout(() => buscarProdutos(), filtro || precoMaximo ? ATRASO_BUSCA_MS : 0);
+    return () => clearTimeout(espera);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [filtro, filtroSelecionado, ordenacao, precoMaximo, somenteEmEstoque]);
 
   function irParaPerfil() {
     navigate('/perfil');
@@ -94,7 +106,7 @@ export default function PaginaInicial() {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Id': userId
+        ...cabecalhoAuth()
       },
       body: JSON.stringify({ livro_id: livroId }),
     })
@@ -141,32 +153,57 @@ export default function PaginaInicial() {
       <div className="filtros-container">
         <input
           type="text"
-          placeholder="Buscar livros pelo título..."
+          placeholder="Buscar livros por título ou sinopse..."
           value={filtro}
-          onChange={e => {
-            setFiltro(e.target.value);
-            setFiltroSelecionado('');
-          }}
+          onChange={e => setFiltro(e.target.value)}
           className="barra-pesquisa"
-          aria-label="Busca livros pelo título"
+          aria-label="Busca livros por título ou sinopse"
         />
 
         <select
           value={filtroSelecionado}
-          onChange={e => {
-            setFiltroSelecionado(e.target.value);
-            setFiltro('');
-          }}
+          onChange={e => setFiltroSelecionado(e.target.value)}
           className="select-categoria"
           aria-label="Filtrar por gênero"
         >
           <option value="">Filtrar por gênero...</option>
           {filtros.map(f => (
             <option key={f.id} value={f.id}>
-              {f.nome}
+              {f.nome} ({somenteEmEstoque ? f.em_estoque : f.livros})
             </option>
           ))}
         </select>
+
+        <select
+          value={ordenacao}
+          onChange={e => setOrdenacao(e.target.value)}
+          className="select-categoria"
+          aria-label="Ordenar livros"
+        >
+          <option value="">Ordem de cadastro</option>
+          <option value="preco">Menor preço</option>
+          <option value="nome">Título (A-Z)</option>
+        </select>
+
+        <input
+          type="number"
+          min="0"
+          step="0.01"
+          placeholder="Preço máximo (R$)"
+          value={precoMaximo}
+          onChange={e => setPrecoMaximo(e.target.value)}
+          className="barra-pesquisa"
+          aria-label="Preço máximo"
+        />
+
+        <label>
+          <input
+            type="checkbox"
+            checked={somenteEmEstoque}
+            onChange={e => setSomenteEmEstoque(e.target.checked)}
+          />
+          Só em estoque
+        </label>
       </div>
 
       {loading && <p>Carregando livros...</p>}
@@ -224,6 +261,12 @@ export default function PaginaInicial() {
           </div>
         ))}
       </div>
+
+      {!loading && proximoCursor && (
+        <button className="botao-carregar-mais" onClick={() => buscarProdutos(proximoCursor)}>
+          Carregar mais livros
+        </button>
+      )}
     </div>
   );
 }
@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
+import { cabecalhoAuth } from '../auth';
 
 export default function Perfil() {
   const navigate = useNavigate();
@@ -27,7 +28,7 @@ export default function Perfil() {
 
     fetch(urlUsuario, {
       headers: {
-        'X-User-Id': userFromStorage.id
+        ...cabecalhoAuth()
       }
     })
       .then(res => {
@@ -64,7 +65,7 @@ export default function Perfil() {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Id': usuarioLogado.id
+        ...cabecalhoAuth()
       },
       body: JSON.stringify({
         nome: novoNome,
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, jsonify, make_response, request
+
+from paginacao import ParametroInvalido
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+class Registro:
+    __slots__ = ('hash', 'expira_em', 'status', 'corpo', 'mimetype')
+
+    def __init__(self, hash, expira_em):
+        self.hash = hash
+        self.expira_em = expira_em
+        # status None = o primeiro pedido com essa chave ainda está rodando
+        self.status = None
+        self.corpo = None
+        self.mimetype = None
+
+
+class CacheIdempotencia:
+    # Header Idempotency-Key nos POST que criam coisas. A primeira execução
+    # guarda o hash do corpo e a resposta num LRU com validade; uma repetição
+    # com a mesma chave (e o mesmo corpo) só devolve a resposta guardada, sem
+    # abrir outra transação. A chave vale por usuário, para um cliente não
+    # receber a resposta de outro.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._registros = OrderedDict()
+        self.ttl = 86400
+        self.capacidade = 10000
+        self.repeticoes = 0
+        self.em_andamento = 0
+        self.corpo_diferente = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCIA_TTL_SEGUNDOS', self.ttl)
+        self.capacidade = app.config.get('IDEMPOTENCIA_MAX_CHAVES', self.capacidade)
+
+    def _obter(self, chave, agora):
+        registro = self._registros.get(chave)
+        if registro is not None and registro.expira_em <= agora:
+            del self._registros[chave]
+            return None
+        if registro is not None:
+            self._registros.move_to_end(chave)
+        return registro
+
+    def _guardar(self, chave, registro):
+        self._registros[chave] = registro
+        while len(self._registros) > self.capacidade:
+            self._registros.popitem(last=False)
+
+    def proteger(self, view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            chave_cliente = request.headers.get('Idempotency-Key')
+            if not chave_cliente:
+                return view(*args, **kwargs)
+            if len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+                raise ParametroInvalido('Idempotency-Key muito longa')
+
+            usuario = g.get('usuario_token')
+            chave = (request.endpoint, usuario.id if usuario else None, chave_cliente)
+            hash = hashlib.sha256(request.get_data()).hexdigest()
+            agora = time.monotonic()
+            with self._lock:
+                registro = self._obter(chave, agora)
+                if registro is None:
+                    registro = Registro(hash, agora + self.ttl)
+                    self._guardar(chave, registro)
+                    novo = True
+                else:
+                    novo = False
+
+            if not novo:
+                if registro.hash != hash:
+                    self.corpo_diferente += 1
+                    return jsonify({'erro': 'Idempotency-Key já usada com outro corpo'}), 422
+                with self._lock:
+                    status, corpo, mimetype = registro.status, registro.corpo, registro.mimetype
+                if status is None:
+                    self.em_andamento += 1
+                    return jsonify({'erro': 'Pedido com esta Idempotency-Key ainda em andamento'}), 409
+                self.repeticoes += 1
+                resposta = Response(corpo, status=status, mimetype=mimetype)
+                resposta.headers['Idempotent-Replayed'] = 'true'
+                return resposta
+
+            guardar = False
+            try:
+                resposta = make_response(view(*args, **kwargs))
+                # Erros do servidor, conflitos passageiros (carrinho mudou no
+                # meio) e recusas por sobrecarga não são guardados: a
+                # repetição deve tentar de novo
+                guardar = resposta.status_code < 500 and resposta.status_code not in (409, 429)
+                if guardar:
+                    corpo = resposta.get_data()
+                    # Os três juntos sob a trava, status por último: quem
+                    # repete nunca vê um registro pronto sem corpo
+                    with self._lock:
+                        registro.corpo = corpo
+                        registro.mimetype = resposta.mimetype
+                        registro.status = resposta.status_code
+                return resposta
+            finally:
+                if not guardar:
+                    with self._lock:
+                        if self._registros.get(chave) is registro:
+                            del self._registros[chave]
+        return envolvida
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'chaves': len(self._registros),
+                'capacidade': self.capacidade,
+                'ttl_segundos': self.ttl,
+                'repeticoes': self.repeticoes,
+                'em_andamento': self.em_andamento,
+                'corpo_diferente': self.corpo_diferente
+            }
+
+
+idempotencia = CacheIdempotencia()
@@ -0,0 +1,107 @@
+import heapq
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+
+
+def normalizar(texto):
+    sem_acento = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(c for c in sem_acento if not unicodedata.combining(c))
+    return ' '.join(sem_acento.lower().split())
+
+
+def trigramas(texto):
+    # Mesmo esquema do pg_trgm: cada palavra ganha dois espaços antes e um
+    # depois, para que início e fim de palavra pesem na similaridade.
+    resultado = set()
+    for palavra in normalizar(texto).split():
+        preenchida = f'  {palavra} '
+        for i in range(len(preenchida) - 2):
+            resultado.add(preenchida[i:i + 3])
+    return frozenset(resultado)
+
+
+class IndiceTrigramas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(set)
+        self._trigramas = {}
+        self._nomes = {}
+        self.construido = False
+        self.tempo_construcao_ms = None
+
+    def construir(self, pares):
+        inicio = time.perf_counter()
+        postings = defaultdict(set)
+        por_id = {}
+        nomes = {}
+        for id, nome in pares:
+            grams = trigramas(nome)
+            por_id[id] = grams
+            nomes[id] = nome
+            for g in grams:
+                postings[g].add(id)
+
+        with self._lock:
+            self._postings, self._trigramas, self._nomes = postings, por_id, nomes
+            self.construido = True
+            self.tempo_construcao_ms = (time.perf_counter() - inicio) * 1000
+
+    def adicionar(self, id, nome):
+        grams = trigramas(nome)
+        with self._lock:
+            self._remover(id)
+            self._trigramas[id] = grams
+            self._nomes[id] = nome
+            for g in grams:
+                self._postings[g].add(id)
+
+    def remover(self, id):
+        with self._lock:
+            self._remover(id)
+
+    def _remover(self, id):
+        for g in self._trigramas.pop(id, ()):
+            ids = self._postings.get(g)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._postings[g]
+        self._nomes.pop(id, None)
+
+    def buscar(self, texto, k=10, similaridade_minima=0.1):
+        consulta = trigramas(texto)
+        if not consulta:
+            return []
+
+        with self._lock:
+            comuns = Counter(chain.from_iterable(self._postings.get(g, ()) for g in consulta))
+
+            # Similaridade de Jaccard entre os conjuntos de trigramas
+            candidatos = []
+            for id, n in comuns.items():
+                score = n / (len(consulta) + len(self._trigramas[id]) - n)
+                if score >= similaridade_minima:
+                    candidatos.append((score, -id))
+            melhores = heapq.nlargest(k, candidatos)
+            return [(-id, self._nomes[-id], score) for score, id in melhores]
+
+    def estatisticas(self):
+        with self._lock:
+            memoria = sys.getsizeof(self._postings) + sys.getsizeof(self._trigramas) + sys.getsizeof(self._nomes)
+            for g, ids in self._postings.items():
+                memoria += sys.getsizeof(g) + sys.getsizeof(ids)
+            for grams in self._trigramas.values():
+                memoria += sys.getsizeof(grams)
+            for nome in self._nomes.values():
+                memoria += sys.getsizeof(nome)
+            return {
+                'construido': self.construido,
+                'livros': len(self._trigramas),
+                'trigramas': len(self._postings),
+                'tempo_construcao_ms': self.tempo_construcao_ms,
+                'memoria_bytes': memoria
+            }
@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from flask import jsonify, request
+
+from models import AcessadoresSite
+
+
+class BaldesDeFichas:
+    # Um balde por chave (IP, e-mail): começa cheio com `capacidade` fichas e
+    # recupera `capacidade` fichas a cada `periodo` segundos; cada tentativa
+    # gasta uma. Balde cheio é igual a balde inexistente, então chaves paradas
+    # há mais de `periodo` são descartadas. Para achá-las sem varrer tudo, as
+    # chaves ficam anotadas na fatia de tempo em que foram usadas e a limpeza
+    # só olha as fatias antigas.
+    def __init__(self, capacidade, periodo, fatia=60):
+        self.capacidade = capacidade
+        self.periodo = periodo
+        self.taxa = capacidade / periodo
+        self.fatia = fatia
+        self._baldes = {}
+        self._por_fatia = defaultdict(list)
+        self._ultima_limpeza = 0.0
+
+    def consumir(self, chave, agora):
+        # Devolve 0 se a tentativa pode seguir, senão os segundos até a
+        # próxima ficha
+        balde = self._baldes.get(chave)
+        if balde is None:
+            fichas = self.capacidade
+        else:
+            fichas = min(self.capacidade, balde[0] + (agora - balde[1]) * self.taxa)
+        if fichas < 1:
+            return (1 - fichas) / self.taxa
+
+        self._baldes[chave] = [fichas - 1, agora]
+        self._por_fatia[int(agora // self.fatia)].append(chave)
+        return 0
+
+    def limpar(self, agora):
+        if agora - self._ultima_limpeza < self.fatia:
+            return
+        self._ultima_limpeza = agora
+        limite = agora - self.periodo
+        for fatia in [f for f in self._por_fatia if (f + 1) * self.fatia < limite]:
+            for chave in self._por_fatia.pop(fatia):
+                balde = self._baldes.get(chave)
+                if balde is not None and balde[1] < limite:
+                    del self._baldes[chave]
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+class LimiteLogin:
+    # Limite de tentativas por IP e por e-mail na frente de login e cadastro.
+    # A recusa acontece antes de ler o banco ou rodar bcrypt, então uma
+    # rajada de credenciais vazadas custa só uma consulta num dicionário.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_ip = BaldesDeFichas(20, 60)
+        self.por_email = BaldesDeFichas(5, 300)
+        self.permitidos = 0
+        self.recusados_ip = 0
+        self.recusados_email = 0
+
+    def init_app(self, app):
+        self.por_ip = BaldesDeFichas(*app.config.get('LOGIN_LIMITE_IP', (20, 60)))
+        self.por_email = BaldesDeFichas(*app.config.get('LOGIN_LIMITE_EMAIL', (5, 300)))
+
+    def _verificar(self, ip, email):
+        agora = time.monotonic()
+        with self._lock:
+            self.por_ip.limpar(agora)
+            self.por_email.limpar(agora)
+            espera = self.por_ip.consumir(ip, agora)
+            if espera:
+                self.recusados_ip += 1
+                return espera
+            if email:
+                espera = self.por_email.consumir(email, agora)
+                if espera:
+                    self.recusados_email += 1
+                    return espera
+            self.permitidos += 1
+            return 0
+
+    def proteger(self, view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            dados = request.get_json(silent=True)
+            email = AcessadoresSite.normalizar_email(dados.get('email')) if isinstance(dados, dict) else ''
+            espera = self._verificar(request.remote_addr, email)
+            if espera:
+                segundos = max(1, math.ceil(espera))
+                resposta = jsonify({'erro': f'Muitas tentativas, tente novamente em {segundos} s'})
+                resposta.status_code = 429
+                resposta.headers['Retry-After'] = str(segundos)
+                return resposta
+            return view(*args, **kwargs)
+        return envolvida
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'ips': len(self.por_ip),
+                'emails': len(self.por_email),
+                'permitidos': self.permitidos,
+                'recusados_ip': self.recusados_ip,
+                'recusados_email': self.recusados_email
+            }
+
+
+limite_login = LimiteLogin()
@@ -9,6 +9,9 @@ class AcessadoresSite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
+    # E-mail sem espaços nas pontas e em minúsculas; é por ele que login e
+    # cadastro procuram, com índice único
+    email_normalizado = db.Column(db.String(100), unique=True, nullable=False)
     cep = db.Column(db.String(9))
     cpf = db.Column(db.String(14))
     data_nascimento = db.Column(db.Date)
@@ -18,6 +21,10 @@ class AcessadoresSite(db.Model):
 
     livros = db.relationship('Livro', back_populates='usuario', cascade='all, delete-orphan')
 
+    @staticmethod
+    def normalizar_email(email):
+        return email.strip().lower() if isinstance(email, str) else ''
+
     @staticmethod
     def calcular_idade(data_nascimento):
         hoje = date.today()
@@ -64,6 +71,8 @@ class Livro(db.Model):
     preco = db.Column(db.Float, nullable=False)
     imagem_url = db.Column(db.String(255))
     estoque = db.Column(db.Integer, nullable=False)
+    # Quantas fatias de estoque_slots o livro usa (0 = contador só na linha)
+    estoque_fatias = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     sinopse = db.Column(db.Text, nullable=False)
 
     acessadores_site_id = db.Column(db.Integer, db.ForeignKey('acessadores_site.id'), nullable=False)
@@ -74,6 +83,17 @@ class Livro(db.Model):
 
     carrinho_items = db.relationship('Carrinho', back_populates='livro', cascade='all, delete-orphan')
 
+    # Preenchida só nas buscas por texto (MATCH ... AGAINST)
+    relevancia = db.query_expression()
+
+    __table_args__ = (
+        db.Index('ix_livros_busca', 'nome', 'sinopse', mysql_prefix='FULLTEXT'),
+        db.Index('ix_livros_filtro_preco', 'filtro_id', 'preco', 'id'),
+        db.Index('ix_livros_filtro_nome', 'filtro_id', 'nome', 'id'),
+        db.Index('ix_livros_preco', 'preco', 'id'),
+        db.Index('ix_livros_nome', 'nome', 'id'),
+    )
+
     def __repr__(self):
         return f'<Livro {self.nome}>'
 
@@ -88,5 +108,70 @@ class Carrinho(db.Model):
     acessadores_site_id = db.Column(db.Integer, db.ForeignKey('acessadores_site.id'), nullable=False)
     usuario = db.relationship('AcessadoresSite')
 
+    quantidade = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Até quando o estoque fica separado para este usuário (UTC). Renovado a
+    # cada inclusão; linhas vencidas são devolvidas ao estoque pelo varredor.
+    # NULL só em linhas anteriores à coluna, que o varredor data na 1ª volta.
+    reservado_ate = db.Column(db.DateTime, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('acessadores_site_id', 'livro_id', name='uq_carrinho_usuario_livro'),
+    )
+
+    def __repr__(self):
+        return f'<Carrinho livro_id={self.livro_id} acessadores_site_id={self.acessadores_site_id} quantidade={self.quantidade}>'
+
+class Pedido(db.Model):
+    __tablename__ = 'pedidos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    acessadores_site_id = db.Column(db.Integer, db.ForeignKey('acessadores_site.id'), nullable=False, index=True)
+    criado_em = db.Column(db.DateTime, nullable=False)
+    valor_total = db.Column(db.Numeric(12, 2), nullable=False)
+
+    itens = db.relationship('ItemPedido', back_populates='pedido', order_by='ItemPedido.id')
+
+    def __repr__(self):
+        return f'<Pedido {self.id} acessadores_site_id={self.acessadores_site_id}>'
+
+class ItemPedido(db.Model):
+    __tablename__ = 'itens_pedido'
+
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos.id'), nullable=False, index=True)
+    pedido = db.relationship('Pedido', back_populates='itens')
+
+    # Nome e preço copiados no fechamento: o pedido não muda se o livro for
+    # editado ou apagado depois
+    livro_id = db.Column(db.Integer, db.ForeignKey('livros.id', ondelete='SET NULL'))
+    nome = db.Column(db.String(100), nullable=False)
+    preco_unitario = db.Column(db.Numeric(12, 2), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ItemPedido pedido_id={self.pedido_id} livro_id={self.livro_id} quantidade={self.quantidade}>'
+
+class EstoqueSlot(db.Model):
+    __tablename__ = 'estoque_slots'
+
+    livro_id = db.Column(db.Integer, db.ForeignKey('livros.id', ondelete='CASCADE'), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
     def __repr__(self):
-        return f'<Carrinho livro_id={self.livro_id} acessadores_site_id={self.acessadores_site_id}>'
+        return f'<EstoqueSlot livro_id={self.livro_id} slot={self.slot} quantidade={self.quantidade}>'
+
+# Estoque visível do livro: a própria coluna mais, quando fatiado, a soma das
+# fatias. Toda leitura de estoque passa por aqui.
+Livro.estoque_atual = db.column_property(
+    db.case(
+        (
+            Livro.estoque_fatias > 0,
+            Livro.estoque + db.select(db.func.coalesce(db.func.sum(EstoqueSlot.quantidade), 0))
+            .where(EstoqueSlot.livro_id == Livro.id)
+            .correlate_except(EstoqueSlot)
+            .scalar_subquery()
+        ),
+        else_=Livro.estoque
+    )
+)
@@ -0,0 +1,109 @@
+import base64
+import json
+import math
+import struct
+
+from flask import request
+from sqlalchemy import tuple_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(ordem, valor, id):
+    bruto = json.dumps({'o': ordem, 'v': valor, 'id': id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, ordem):
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        valor, id = dados['v'], int(dados['id'])
+    except (ValueError, KeyError, TypeError):
+        raise ParametroInvalido('Cursor inválido')
+    # O valor vai direto para o driver: só escalares JSON, sem bool nem nan/inf
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float, type(None))):
+        raise ParametroInvalido('Cursor inválido')
+    if isinstance(valor, float) and not math.isfinite(valor):
+        raise ParametroInvalido('Cursor inválido')
+    if dados.get('o') != ordem:
+        raise ParametroInvalido('Cursor não corresponde à ordenação pedida')
+    return valor, id
+
+
+def ler_paginacao():
+    # Sem limit nem cursor a rota devolve a lista completa, como antes
+    limite = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limite is None and cursor is None:
+        return None
+
+    try:
+        limite = int(limite) if limite is not None else LIMITE_PADRAO
+    except ValueError:
+        raise ParametroInvalido('Parâmetro limit inválido')
+    if limite <= 0:
+        raise ParametroInvalido('Parâmetro limit deve ser maior que zero')
+    return min(limite, LIMITE_MAXIMO), cursor
+
+
+def tipos_do_valor(coluna, tipo=None):
+    # Tipos aceitos no valor do cursor para a coluna de ordenação; None se o
+    # tipo da coluna não é conhecido (expressões sem tipo, como MATCH)
+    if tipo is None:
+        try:
+            tipo = coluna.type.python_type
+        except NotImplementedError:
+            return None
+    return (int, float) if tipo in (int, float) else (tipo,)
+
+
+def ordenar(query, coluna_id, coluna=None, descendente=False):
+    if coluna is None:
+        return query.order_by(coluna_id.desc() if descendente else coluna_id.asc())
+    if descendente:
+        return query.order_by(coluna.desc(), coluna_id.desc())
+    return query.order_by(coluna.asc(), coluna_id.asc())
+
+
+def paginar(query, coluna_id, limite, cursor, ordem='id', coluna=None, descendente=False,
+            chave_linha=None, valor_cursor=None, tipo_valor=None):
+    # Paginação por chave (seek): filtra a partir da última linha vista em vez
+    # de usar OFFSET, então o custo de cada página não cresce com a tabela.
+    # valor_cursor converte o valor do cursor antes de comparar com a coluna;
+    # tipo_valor diz o tipo do valor quando a coluna é uma expressão sem tipo.
+    chave = coluna_id if coluna is None else tuple_(coluna, coluna_id)
+    if cursor and limite is not None:
+        valor, ultimo_id = decodificar_cursor(cursor, ordem)
+        tipos = None if coluna is None else tipos_do_valor(coluna, tipo_valor)
+        if tipos is not None and not isinstance(valor, tipos):
+            raise ParametroInvalido('Cursor inválido')
+        if valor_cursor is not None:
+            try:
+                valor = valor_cursor(valor)
+            except (TypeError, ValueError, struct.error):
+                raise ParametroInvalido('Cursor inválido')
+        ultimo = ultimo_id if coluna is None else tuple_(valor, ultimo_id)
+        query = query.filter(chave < ultimo if descendente else chave > ultimo)
+
+    query = ordenar(query, coluna_id, coluna, descendente)
+    if limite is None:
+        return query.all(), None
+
+    linhas = query.limit(limite + 1).all()
+    if len(linhas) <= limite:
+        return linhas, None
+
+    linhas = linhas[:limite]
+    if chave_linha is None:
+        ultimo = linhas[-1]
+        valor = None if coluna is None else getattr(ultimo, coluna.key)
+        chave_linha = (valor, getattr(ultimo, coluna_id.key))
+    else:
+        chave_linha = chave_linha(linhas[-1])
+    return linhas, codificar_cursor(ordem, *chave_linha)
@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from sqlalchemy import delete, insert, tuple_
+
+from carrinho import PRECO_DECIMAL, ErroCarrinho, agora_utc
+from models import db, Carrinho, ItemPedido, Livro, Pedido
+
+
+def fechar_pedido(usuario_id):
+    # Transforma o carrinho em pedido numa transação curta (quem chama faz o
+    # commit). O estoque já saiu na inclusão no carrinho, então aqui só se
+    # trava livros para congelar os preços: sempre em ordem de id, a mesma
+    # das retiradas de estoque, para dois fechamentos não se travarem em
+    # ordens opostas.
+    linhas = db.session.query(Carrinho.id, Carrinho.livro_id, Carrinho.quantidade).filter(
+        Carrinho.acessadores_site_id == usuario_id
+    ).order_by(Carrinho.livro_id).all()
+    if not linhas:
+        raise ErroCarrinho('Carrinho vazio', 400)
+
+    livros = {
+        id: (nome, preco)
+        for id, nome, preco in db.session.query(Livro.id, Livro.nome, PRECO_DECIMAL).filter(
+            Livro.id.in_([livro_id for _, livro_id, _ in linhas])
+        ).order_by(Livro.id).with_for_update()
+    }
+
+    itens = []
+    total = Decimal('0.00')
+    for _, livro_id, quantidade in linhas:
+        if livro_id not in livros:
+            raise ErroCarrinho('O carrinho mudou durante a operação, tente novamente', 409)
+        nome, preco = livros[livro_id]
+        preco = Decimal(preco).quantize(Decimal('0.01'))
+        itens.append({'livro_id': livro_id, 'nome': nome, 'preco_unitario': preco, 'quantidade': quantidade})
+        total += preco * quantidade
+
+    pedido = Pedido(acessadores_site_id=usuario_id, criado_em=agora_utc(), valor_total=total)
+    db.session.add(pedido)
+    db.session.flush()
+    for item in itens:
+        item['pedido_id'] = pedido.id
+    db.session.execute(insert(ItemPedido), itens)
+
+    # Só apaga as linhas que continuam como foram lidas; se o varredor de
+    # reservas ou outro pedido do usuário mexeu nelas, nada é aplicado
+    apagadas = db.session.execute(
+        delete(Carrinho).where(tuple_(Carrinho.id, Carrinho.quantidade).in_([(id, q) for id, _, q in linhas])),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if apagadas != len(linhas):
+        raise ErroCarrinho('O carrinho mudou durante a operação, tente novamente', 409)
+    return pedido, itens
+
+
+def serializar_pedido(pedido, itens):
+    return {
+        'id': pedido.id,
+        'criado_em': pedido.criado_em.isoformat() + 'Z',
+        'valor_total': f'{pedido.valor_total:.2f}',
+        'itens': [
+            {
+                'livro_id': item['livro_id'],
+                'nome': item['nome'],
+                'preco_unitario': f"{item['preco_unitario']:.2f}",
+                'quantidade': item['quantidade']
+            }
+            for item in itens
+        ]
+    }
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import delete, tuple_, update
+
+from cache_filtros import cache_filtros
+from carrinho import agora_utc, mover_estoque, mudancas_de_estoque, prazo_reserva
+from models import db, Carrinho
+from versao_catalogo import versao_catalogo
+
+
+class VarredorReservas:
+    # Thread em segundo plano que devolve ao estoque as linhas de carrinho
+    # com reserva vencida. Cada lote é uma transação curta: um SELECT das
+    # linhas vencidas, um UPDATE em livros com a soma por livro e um DELETE
+    # protegido que só apaga as linhas se continuam como foram lidas.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self.lote = 500
+        self.intervalo = 60
+        self.varreduras = 0
+        self.reservas_liberadas = 0
+        self.unidades_devolvidas = 0
+        self.conflitos = 0
+        self.linhas_datadas = 0
+        self.erros = 0
+        self.ultima_varredura = None
+        self.ultima_duracao_ms = None
+
+    def iniciar(self, app):
+        self._app = app
+        self.lote = app.config.get('RESERVA_LOTE', self.lote)
+        self.intervalo = app.config.get('RESERVA_INTERVALO_SEGUNDOS', self.intervalo)
+        if app.config.get('RESERVA_VARREDOR_ATIVO', True):
+            app.before_request(self._garantir_thread)
+
+    def _garantir_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._trabalhar, name='varredor-reservas', daemon=True)
+                    self._thread.start()
+
+    def _trabalhar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                with self._app.app_context():
+                    self.varrer()
+            except Exception:
+                self.erros += 1
+                self._app.logger.exception('Falha na varredura de reservas')
+
+    def datar_linhas_antigas(self):
+        # Linhas criadas antes da coluna reservado_ate existir ficam com NULL e
+        # nunca venceriam; recebem um prazo cheio a partir de agora (a
+        # migração faz o mesmo, isto cobre bancos onde ela não rodou)
+        datadas = db.session.execute(
+            update(Carrinho).where(Carrinho.reservado_ate.is_(None)).values(reservado_ate=prazo_reserva()),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        self.linhas_datadas += datadas
+
+    def varrer(self):
+        inicio = time.perf_counter()
+        self.datar_linhas_antigas()
+        while self.varrer_lote() == self.lote:
+            pass
+        self.varreduras += 1
+        self.ultima_varredura = agora_utc().isoformat()
+        self.ultima_duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    def varrer_lote(self):
+        agora = agora_utc()
+        linhas = db.session.query(Carrinho.id, Carrinho.livro_id, Carrinho.quantidade).filter(
+            Carrinho.reservado_ate < agora
+        ).order_by(Carrinho.reservado_ate).limit(self.lote).all()
+        if not linhas:
+            return 0
+
+        deltas = defaultdict(int)
+        for _, livro_id, quantidade in linhas:
+            deltas[livro_id] += quantidade
+        deltas = dict(deltas)
+
+        # Livros primeiro, como nas rotas do carrinho
+        devolvido = mover_estoque(deltas)
+        apagadas = db.session.execute(
+            delete(Carrinho).where(
+                tuple_(Carrinho.id, Carrinho.quantidade).in_([(id, q) for id, _, q in linhas]),
+                Carrinho.reservado_ate < agora
+            ),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not devolvido or apagadas != len(linhas):
+            # Alguém mexeu nessas linhas no meio; fica para a próxima volta
+            db.session.rollback()
+            self.conflitos += 1
+            return 0
+
+        mudancas = mudancas_de_estoque(deltas)
+        db.session.commit()
+        versao_catalogo.incrementar()
+        for filtro_id, antes, depois in mudancas:
+            cache_filtros.mudar_estoque(filtro_id, antes, depois)
+        self.reservas_liberadas += len(linhas)
+        self.unidades_devolvidas += sum(deltas.values())
+        return len(linhas)
+
+    def estatisticas(self):
+        return {
+            'ativo': self._thread is not None,
+            'intervalo_segundos': self.intervalo,
+            'lote': self.lote,
+            'varreduras': self.varreduras,
+            'reservas_liberadas': self.reservas_liberadas,
+            'unidades_devolvidas': self.unidades_devolvidas,
+            'conflitos': self.conflitos,
+            'linhas_datadas': self.linhas_datadas,
+            'erros': self.erros,
+            'ultima_varredura': self.ultima_varredura,
+            'ultima_duracao_ms': self.ultima_duracao_ms
+        }
+
+
+varredor_reservas = VarredorReservas()
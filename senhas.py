@@ -0,0 +1,123 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt
+
+from models import db
+
+CUSTO_PADRAO = 12
+
+
+class SenhasOcupadas(Exception):
+    def __init__(self, retry_after=1):
+        super().__init__('Muitos pedidos de login no momento, tente novamente em instantes')
+        self.retry_after = retry_after
+
+
+# Rodam nos processos do pool: precisam ser funções de módulo
+def _gerar_hash(senha, custo):
+    return bcrypt.hashpw(senha, bcrypt.gensalt(custo))
+
+
+def _verificar(senha, senha_hash):
+    return bcrypt.checkpw(senha, senha_hash)
+
+
+def custo_do_hash(senha_hash):
+    # '$2b$12$...' -> 12
+    try:
+        return int(senha_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class Senhas:
+    # bcrypt gasta dezenas a centenas de ms de CPU por chamada; aqui ele roda
+    # num pool de processos, fora da thread do pedido e fora do GIL. Cabem no
+    # máximo `processos + fila` trabalhos ao mesmo tempo: quem não consegue
+    # lugar em `espera_segundos`, ou cujo trabalho não termina em
+    # `timeout_segundos`, recebe SenhasOcupadas (503) em vez de empilhar.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._vagas = None
+        self.custo = CUSTO_PADRAO
+        self.processos = 2
+        self.espera = 1.0
+        self.timeout = 5.0
+        self.recusados = 0
+        self.expirados = 0
+        self.rehashes = 0
+
+    def init_app(self, app):
+        self.custo = app.config.get('SENHA_CUSTO_BCRYPT', self.custo)
+        self.processos = app.config.get('SENHA_PROCESSOS', self.processos)
+        self.espera = app.config.get('SENHA_ESPERA_SEGUNDOS', self.espera)
+        self.timeout = app.config.get('SENHA_TIMEOUT_SEGUNDOS', self.timeout)
+        fila = app.config.get('SENHA_FILA', 4 * max(self.processos, 1))
+        self._vagas = threading.BoundedSemaphore(max(self.processos, 1) + fila)
+
+    def _executar(self, funcao, *args):
+        if not self.processos:
+            # Sem pool (desenvolvimento): roda na própria thread
+            return funcao(*args)
+
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: o app tem threads, e fork de processo com threads
+                    # pode herdar travas presas
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.processos, mp_context=multiprocessing.get_context('spawn')
+                    )
+
+        if not self._vagas.acquire(timeout=self.espera):
+            self.recusados += 1
+            raise SenhasOcupadas()
+        try:
+            futuro = self._pool.submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            self.expirados += 1
+            raise SenhasOcupadas()
+
+    def gerar_hash(self, senha):
+        return self._executar(_gerar_hash, senha.encode('utf-8'), self.custo).decode('utf-8')
+
+    def verificar(self, senha, senha_hash):
+        return self._executar(_verificar, senha.encode('utf-8'), senha_hash.encode('utf-8'))
+
+    def precisa_rehash(self, senha_hash):
+        return custo_do_hash(senha_hash) != self.custo
+
+    def rehash_se_preciso(self, usuario, senha):
+        # Chamado logo depois de um login válido: se o custo configurado mudou,
+        # regrava o hash enquanto temos a senha. Falhar aqui não derruba o login.
+        if not self.precisa_rehash(usuario.senha_hash):
+            return False
+        try:
+            usuario.senha_hash = self.gerar_hash(senha)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return False
+        self.rehashes += 1
+        return True
+
+    def estatisticas(self):
+        return {
+            'custo': self.custo,
+            'processos': self.processos,
+            'recusados': self.recusados,
+            'expirados': self.expirados,
+            'rehashes': self.rehashes
+        }
+
+
+senhas = Senhas()
@@ -0,0 +1,90 @@
+from flask import json, request
+from sqlalchemy.orm import joinedload, load_only
+
+from models import AcessadoresSite, Livro
+from paginacao import ParametroInvalido, paginar
+
+COLUNAS_LIVRO = ('id', 'nome', 'preco', 'imagem_url', 'estoque', 'sinopse')
+CAMPOS_LIVRO = COLUNAS_LIVRO + ('filtro',)
+CAMPOS_LIVRO_DETALHE = CAMPOS_LIVRO + ('usuario',)
+CAMPOS_LIVRO_CARRINHO = ('id', 'nome', 'preco', 'imagem_url', 'estoque', 'filtro')
+
+# Campo da API -> atributo do modelo, quando os nomes diferem. O estoque
+# exposto soma as fatias dos livros com estoque fatiado.
+ATRIBUTOS_LIVRO = {'estoque': 'estoque_atual'}
+
+CAMPOS_USUARIO = ('id', 'nome', 'email', 'cep', 'cpf', 'data_nascimento', 'idade', 'tipo')
+
+
+def ler_campos(permitidos):
+    # ?fields=id,nome,preco  ->  ('id', 'nome', 'preco'); sem o parâmetro
+    # devolve todos os campos permitidos
+    bruto = request.args.get('fields')
+    if not bruto:
+        return permitidos
+
+    pedidos = {c.strip() for c in bruto.split(',') if c.strip()}
+    desconhecidos = pedidos - set(permitidos)
+    if desconhecidos:
+        raise ParametroInvalido(f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    pedidos.add('id')
+    return tuple(c for c in permitidos if c in pedidos)
+
+
+def recortar(dados, campos):
+    return {c: dados[c] for c in campos if c in dados}
+
+
+def consultar_livros(*criterios, campos=CAMPOS_LIVRO):
+    # Só as colunas pedidas entram no SELECT (o resto fica adiado), e filtro
+    # e dono vêm no mesmo SELECT via JOIN, então a serialização não dispara
+    # uma consulta extra por livro.
+    colunas = [getattr(Livro, ATRIBUTOS_LIVRO.get(c, c)) for c in campos if c in COLUNAS_LIVRO]
+    opcoes = [load_only(*colunas)]
+    if 'filtro' in campos:
+        opcoes.append(joinedload(Livro.filtro))
+    if 'usuario' in campos:
+        opcoes.append(joinedload(Livro.usuario).load_only(AcessadoresSite.id, AcessadoresSite.nome))
+    return Livro.query.options(*opcoes).filter(*criterios)
+
+
+def serializar_filtro(filtro):
+    return {
+        'id': filtro.id if filtro else None,
+        'nome': filtro.nome if filtro else None
+    }
+
+
+def serializar_livro(l, campos=CAMPOS_LIVRO):
+    dados = {c: getattr(l, ATRIBUTOS_LIVRO.get(c, c)) for c in campos if c in COLUNAS_LIVRO}
+    if 'filtro' in campos:
+        dados['filtro'] = serializar_filtro(l.filtro)
+    if 'usuario' in campos:
+        dados['usuario'] = {
+            'id': l.usuario.id,
+            'nome': l.usuario.nome
+        }
+    return dados
+
+
+def serializar_livros(livros, campos=CAMPOS_LIVRO):
+    return [serializar_livro(l, campos) for l in livros]
+
+
+def transmitir_livros(query, campos=CAMPOS_LIVRO, lote=500, **ordenacao):
+    # Gera o array JSON aos pedaços, percorrendo a consulta em páginas por
+    # chave de `lote` linhas (uma consulta curta por página). O mysqlconnector
+    # não tem cursor do lado do servidor (yield_per traria tudo para a
+    # memória antes da primeira linha); assim só uma página fica carregada, e
+    # o mapa de identidade da sessão só guarda referências fracas.
+    yield '['
+    primeiro = True
+    cursor = None
+    while True:
+        livros, cursor = paginar(query, Livro.id, lote, cursor, **ordenacao)
+        for l in livros:
+            yield ('' if primeiro else ',') + json.dumps(serializar_livro(l, campos))
+            primeiro = False
+        if cursor is None:
+            break
+    yield ']'
@@ -0,0 +1,118 @@
+import gzip
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from versao_catalogo import versao_catalogo
+
+Entrada = namedtuple('Entrada', 'versao corpo corpo_gzip endpoint view_args regenerar')
+
+
+class SnapshotCatalogo:
+    # Guarda os bytes JSON já codificados (e comprimidos) de cada visão de
+    # listagem, por URL. Uma entrada só é servida se foi gerada na versão
+    # atual do catálogo; depois de uma escrita, uma thread em segundo plano
+    # regenera as visões base (sem cursor nem busca) para que o próximo pedido
+    # já as encontre prontas. Páginas seguintes e buscas são pontuais demais
+    # para valer a consulta e só são refeitas quando alguém pede. As escritas
+    # são agrupadas: no máximo uma rodada a cada `intervalo` segundos.
+    def __init__(self, capacidade=64, comprimir=True, intervalo=2.0):
+        self.capacidade = capacidade
+        self.comprimir = comprimir
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._pendente = threading.Event()
+        self._app = None
+        self._thread = None
+
+    def iniciar(self, app):
+        self._app = app
+        self.capacidade = app.config.get('SNAPSHOT_MAX_VISOES', self.capacidade)
+        self.comprimir = app.config.get('SNAPSHOT_GZIP', self.comprimir)
+        self.intervalo = app.config.get('SNAPSHOT_INTERVALO_SEGUNDOS', self.intervalo)
+        versao_catalogo.ao_mudar(self.agendar)
+
+    def obter(self, chave, versao):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada.versao != versao:
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada
+
+    def guardar(self, chave, versao, corpo, endpoint, view_args, regenerar=True):
+        corpo_gzip = gzip.compress(corpo, compresslevel=6) if self.comprimir else None
+        entrada = Entrada(versao, corpo, corpo_gzip, endpoint, view_args, regenerar)
+        with self._lock:
+            atual = self._entradas.get(chave)
+            if atual is None or atual.versao <= versao:
+                self._entradas[chave] = entrada
+                self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+        return entrada
+
+    def agendar(self, versao=None):
+        if self._app is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._trabalhar, name='snapshot-catalogo', daemon=True)
+            self._thread.start()
+        self._pendente.set()
+
+    def _trabalhar(self):
+        ultima_rodada = 0.0
+        while True:
+            self._pendente.wait()
+            # Escritas que chegam durante a espera entram na mesma rodada
+            time.sleep(max(0.0, ultima_rodada + self.intervalo - time.monotonic()))
+            ultima_rodada = time.monotonic()
+            self._pendente.clear()
+            with self._lock:
+                # Mais usadas primeiro
+                visoes = [
+                    (chave, e.endpoint, e.view_args)
+                    for chave, e in reversed(self._entradas.items()) if e.regenerar
+                ]
+            for chave, endpoint, view_args in visoes:
+                if self._pendente.is_set():
+                    break
+                try:
+                    with self._app.test_request_context(chave):
+                        self._app.view_functions[endpoint](**view_args)
+                except Exception:
+                    self._app.logger.exception('Falha ao regenerar snapshot de %s', chave)
+
+
+snapshot_catalogo = SnapshotCatalogo()
+
+
+def responder_entrada(entrada):
+    resposta = Response(entrada.corpo, mimetype='application/json')
+    if entrada.corpo_gzip is not None and request.accept_encodings.quality('gzip') > 0:
+        resposta.set_data(entrada.corpo_gzip)
+        resposta.content_encoding = 'gzip'
+    resposta.vary.add('Accept-Encoding')
+    return resposta
+
+
+def com_snapshot(view):
+    @wraps(view)
+    def envolvida(*args, **kwargs):
+        chave = request.full_path
+        versao = versao_catalogo.atual()
+        entrada = snapshot_catalogo.obter(chave, versao)
+        if entrada is None:
+            resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code != 200 or resposta.is_streamed:
+                return resposta
+            regenerar = 'cursor' not in request.args and 'q' not in request.args
+            entrada = snapshot_catalogo.guardar(
+                chave, versao, resposta.get_data(), request.endpoint, kwargs, regenerar
+            )
+        return responder_entrada(entrada)
+    return envolvida
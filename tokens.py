@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import namedtuple
+
+from flask import g, request
+
+VALIDADE_PADRAO = 12 * 60 * 60
+
+UsuarioToken = namedtuple('UsuarioToken', 'id tipo')
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b'=').decode('ascii')
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def ler_chaves(texto):
+    # 'k2:segredo2,k1:segredo1' -> {'k2': b'segredo2', 'k1': b'segredo1'};
+    # a primeira é a que assina, as outras só validam tokens ainda em uso
+    chaves = {}
+    for par in (texto or '').split(','):
+        kid, _, segredo = par.strip().partition(':')
+        if kid and segredo:
+            chaves[kid] = segredo.encode('utf-8')
+    return chaves
+
+
+class Tokens:
+    # Token assinado emitido no login: 'kid.payload.assinatura', com HMAC-SHA256
+    # sobre o payload ({'id', 'tipo', 'exp'}). Verificar é só recalcular o HMAC,
+    # sem ir ao banco. Rotação: uma chave nova entra na frente da lista e as
+    # antigas continuam validando até os tokens delas expirarem.
+    def __init__(self):
+        self.chaves = {}
+        self.kid_atual = None
+        self.validade = VALIDADE_PADRAO
+
+    def init_app(self, app):
+        self.chaves = ler_chaves(app.config.get('TOKEN_CHAVES'))
+        if not self.chaves:
+            app.logger.warning('TOKEN_CHAVES não configurada; usando uma chave aleatória deste processo')
+            self.chaves = {'local': secrets.token_bytes(32)}
+        self.kid_atual = next(iter(self.chaves))
+        self.validade = app.config.get('TOKEN_VALIDADE_SEGUNDOS', self.validade)
+        app.before_request(self._ler_token)
+
+    def _assinar(self, kid, payload):
+        return _b64(hmac.new(self.chaves[kid], f'{kid}.{payload}'.encode('ascii'), hashlib.sha256).digest())
+
+    def emitir(self, usuario):
+        exp = int(time.time()) + self.validade
+        payload = _b64(json.dumps(
+            {'id': usuario.id, 'tipo': usuario.tipo, 'exp': exp}, separators=(',', ':')
+        ).encode('utf-8'))
+        return f'{self.kid_atual}.{payload}.{self._assinar(self.kid_atual, payload)}', exp
+
+    def verificar(self, token):
+        # O token vem do cliente: qualquer coisa fora do formato é só um
+        # token inválido (None), nunca um erro na rota
+        if not token.isascii():
+            return None
+        try:
+            kid, payload, assinatura = token.split('.')
+        except ValueError:
+            return None
+        if kid not in self.chaves or not hmac.compare_digest(assinatura, self._assinar(kid, payload)):
+            return None
+        try:
+            # binascii.Error e UnicodeDecodeError são ValueError
+            dados = json.loads(_de_b64(payload))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(dados, dict):
+            return None
+        id, tipo, exp = dados.get('id'), dados.get('tipo'), dados.get('exp')
+        if not isinstance(id, int) or not isinstance(tipo, (str, type(None))) or not isinstance(exp, (int, float)):
+            return None
+        if exp < time.time():
+            return None
+        return UsuarioToken(id, tipo)
+
+    def _ler_token(self):
+        cabecalho = request.headers.get('Authorization', '')
+        tipo, _, token = cabecalho.partition(' ')
+        g.usuario_token = self.verificar(token.strip()) if tipo.lower() == 'bearer' and token else None
+
+
+tokens = Tokens()
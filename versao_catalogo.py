@@ -0,0 +1,68 @@
+import hashlib
+import os
+import threading
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+class VersaoCatalogo:
+    # Contador em memória incrementado a cada escrita que muda o que as rotas
+    # do catálogo devolvem. O prefixo aleatório evita que um ETag antigo
+    # continue valendo depois que o processo reinicia e o contador volta a zero.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valor = 0
+        self._ouvintes = []
+        self.instancia = os.urandom(4).hex()
+
+    def ao_mudar(self, ouvinte):
+        self._ouvintes.append(ouvinte)
+
+    def atual(self):
+        return self._valor
+
+    def incrementar(self):
+        with self._lock:
+            self._valor += 1
+            valor = self._valor
+        for ouvinte in self._ouvintes:
+            ouvinte(valor)
+        return valor
+
+
+versao_catalogo = VersaoCatalogo()
+
+
+def etag_atual():
+    # Cada URL (com query string) é uma representação diferente. O resumo
+    # precisa resistir a colisões: a query string é escolhida pelo cliente, e
+    # duas URLs com o mesmo ETag forte se passariam uma pela outra
+    rota = hashlib.sha256(request.full_path.encode('utf-8')).hexdigest()[:32]
+    return f'{versao_catalogo.instancia}-{versao_catalogo.atual()}-{rota}'
+
+
+def com_etag(view):
+    # Lê a versão antes de rodar a view: se uma escrita acontecer no meio, o
+    # cliente recebe um ETag mais antigo que os dados e só refaz o download
+    # na próxima vez, nunca fica com dados velhos.
+    @wraps(view)
+    def envolvida(*args, **kwargs):
+        etag = etag_atual()
+        # Corpos comprimidos são outra representação e ganham ETag próprio
+        variantes = (etag, f'{etag}-gzip', f'{etag}-deflate')
+        casou = next((v for v in variantes if request.if_none_match.contains(v)), None)
+        if casou:
+            resposta = Response(status=304)
+            etag = casou
+        else:
+            resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+            if resposta.content_encoding:
+                etag = f'{etag}-{resposta.content_encoding}'
+        resposta.set_etag(etag)
+        resposta.vary.add('Accept-Encoding')
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
+    return envolvida